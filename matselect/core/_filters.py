@@ -0,0 +1,51 @@
+"""
+Compiled filter predicates for candidate batches.
+
+For large candidate sets, chaining separate comparisons walks each
+array once per condition and allocates a boolean temporary per step.
+When numba is available the compound predicate is JIT-compiled into a
+single fused pass; otherwise a vectorized numpy fallback is used.
+"""
+
+import numpy as np
+
+try:
+    import numba
+    _NUMBA_AVAILABLE = True
+except ImportError:
+    _NUMBA_AVAILABLE = False
+
+
+def _filter_mask_numpy(density: np.ndarray, energy_above_hull: np.ndarray,
+                       max_density: float, max_eah: float,
+                       check_density: bool) -> np.ndarray:
+    """Pure-numpy fallback: single fused boolean expression."""
+    mask = energy_above_hull <= max_eah
+    if check_density:
+        mask &= density <= max_density
+    return mask
+
+
+if _NUMBA_AVAILABLE:
+    @numba.njit(cache=True)
+    def filter_mask(density: np.ndarray, energy_above_hull: np.ndarray,
+                    max_density: float, max_eah: float,
+                    check_density: bool) -> np.ndarray:
+        """
+        Return a boolean mask of candidates within the density and
+        stability bounds.
+
+        The density bound is only evaluated when check_density is True,
+        so rows with NaN density are untouched when the caller has no
+        density constraint but are dropped when one is given — the same
+        semantics as the old pandas comparisons. Rows with NaN
+        energy_above_hull always fail the stability check.
+        """
+        n = energy_above_hull.shape[0]
+        mask = np.empty(n, dtype=np.bool_)
+        for i in range(n):
+            mask[i] = energy_above_hull[i] <= max_eah and \
+                (not check_density or density[i] <= max_density)
+        return mask
+else:
+    filter_mask = _filter_mask_numpy
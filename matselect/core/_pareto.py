@@ -0,0 +1,63 @@
+"""
+Pareto-frontier computation for trade-off analysis.
+
+A material is on the frontier if no other material is at least as good
+on every objective and strictly better on one (all objectives are
+treated as minimized). The dominated-point scan is O(n²), so the kernel
+is JIT-compiled with numba when available; otherwise a vectorized numpy
+fallback is used.
+"""
+
+import numpy as np
+
+try:
+    import numba
+    _NUMBA_AVAILABLE = True
+except ImportError:
+    _NUMBA_AVAILABLE = False
+
+
+def _pareto_mask_numpy(objs: np.ndarray) -> np.ndarray:
+    """Pure-numpy fallback: vectorized domination check per point."""
+    n = objs.shape[0]
+    mask = np.ones(n, dtype=np.bool_)
+    for i in range(n):
+        dominated = np.all(objs <= objs[i], axis=1) & np.any(objs < objs[i], axis=1)
+        if dominated.any():
+            mask[i] = False
+    return mask
+
+
+if _NUMBA_AVAILABLE:
+    @numba.njit(cache=True, parallel=True)
+    def pareto_mask(objs: np.ndarray) -> np.ndarray:
+        """
+        Return a boolean mask of non-dominated rows.
+
+        Args:
+            objs: Array of shape (n, k) with one column per objective,
+                  all objectives minimized
+
+        Returns:
+            Boolean array of shape (n,), True for frontier points
+        """
+        n, k = objs.shape
+        out = np.ones(n, dtype=np.bool_)
+        for i in numba.prange(n):
+            for j in range(n):
+                if j == i:
+                    continue
+                le_all = True
+                lt_any = False
+                for d in range(k):
+                    if objs[j, d] > objs[i, d]:
+                        le_all = False
+                        break
+                    if objs[j, d] < objs[i, d]:
+                        lt_any = True
+                if le_all and lt_any:
+                    out[i] = False
+                    break
+        return out
+else:
+    pareto_mask = _pareto_mask_numpy
@@ -5,10 +5,78 @@ Combines multiple data sources and ML techniques to provide
 intelligent materials recommendations.
 """
 
+from dataclasses import dataclass
 from typing import Dict, List, Optional, Any
 import pandas as pd
 import numpy as np
 from ..sources.materials_project import MaterialsProjectSource
+from ._filters import filter_mask
+from ._pareto import pareto_mask
+
+
+# Extra display/explanation fields fetched only for the top-N materials;
+# the broad candidate search requests just the scoring columns
+_ENRICHMENT_FIELDS = [
+    'material_id', 'composition', 'formation_energy_per_atom',
+    'symmetry', 'theoretical', 'is_stable'
+]
+
+
+@dataclass
+class CandidateBatch:
+    """
+    Struct-of-arrays view of candidate materials.
+
+    The filtering and scoring stages of the pipeline operate on these
+    plain numpy columns; a pandas DataFrame is only materialized again
+    for the final top-N slice.
+    """
+    mp_ids: np.ndarray
+    formulas: np.ndarray
+    density: Optional[np.ndarray]
+    band_gap: Optional[np.ndarray]
+    energy_above_hull: Optional[np.ndarray]
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> 'CandidateBatch':
+        """Build a batch from a search result frame."""
+        def numeric(name):
+            if name not in df.columns:
+                return None
+            return df[name].to_numpy(dtype=np.float32, copy=False)
+
+        return cls(
+            mp_ids=df['mp_id'].to_numpy(),
+            formulas=df['formula'].to_numpy(),
+            density=numeric('density'),
+            band_gap=numeric('band_gap'),
+            energy_above_hull=numeric('energy_above_hull'),
+        )
+
+    def __len__(self) -> int:
+        return len(self.mp_ids)
+
+    def take(self, indices: np.ndarray) -> 'CandidateBatch':
+        """Return a new batch holding the rows at `indices`."""
+        def slice_col(column):
+            return column[indices] if column is not None else None
+
+        return CandidateBatch(
+            mp_ids=self.mp_ids[indices],
+            formulas=self.formulas[indices],
+            density=slice_col(self.density),
+            band_gap=slice_col(self.band_gap),
+            energy_above_hull=slice_col(self.energy_above_hull),
+        )
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Materialize the batch as a pandas DataFrame."""
+        columns = {'mp_id': self.mp_ids, 'formula': self.formulas}
+        for name in ('density', 'band_gap', 'energy_above_hull'):
+            values = getattr(self, name)
+            if values is not None:
+                columns[name] = values
+        return pd.DataFrame(columns)
 
 
 class MatSelectAI:
@@ -75,6 +143,9 @@ class MatSelectAI:
             mp_criteria['max_band_gap'] = requirements['max_band_gap']
         if 'elements' in requirements:
             mp_criteria['elements'] = requirements['elements']
+        if 'max_density' in requirements:
+            # Filter server-side so discarded materials are never downloaded
+            mp_criteria['max_density'] = requirements['max_density']
         
         # Search Materials Project
         candidates = self.mp_source.search_by_properties(**mp_criteria, limit=100)
@@ -84,18 +155,29 @@ class MatSelectAI:
             return RecommendationResults(candidates=pd.DataFrame(), requirements=requirements)
         
         print(f"✓ Found {len(candidates)} candidate materials")
-        
+
+        # The pipeline runs on a struct-of-arrays batch; pandas is only
+        # rebuilt for the final top-N slice
+        batch = CandidateBatch.from_dataframe(candidates)
+
         # Apply additional filters
-        filtered = self._apply_filters(candidates, requirements)
-        
+        mask = self._apply_filters(batch, requirements)
+        filtered = batch.take(np.flatnonzero(mask))
+
+        if len(filtered) == 0:
+            print("❌ No materials passed the filters")
+            return RecommendationResults(candidates=pd.DataFrame(), requirements=requirements)
+
         print(f"✓ {len(filtered)} materials passed all filters")
-        
+
         # Score and rank
-        scored = self._score_materials(filtered, requirements, optimize)
-        
-        # Get top N
-        top_materials = scored.head(top_n)
-        
+        scores = self._score_materials(filtered, requirements, optimize)
+
+        # Get top N, materialized back into a DataFrame
+        order = np.argsort(-scores)[:top_n]
+        top_materials = filtered.take(order).to_dataframe()
+        top_materials['match_score'] = scores[order]
+
         # Enrich with additional data
         enriched = self._enrich_materials(top_materials)
         
@@ -108,82 +190,101 @@ class MatSelectAI:
             show_tradeoffs=show_tradeoffs
         )
     
-    def _apply_filters(self, 
-                       candidates: pd.DataFrame, 
-                       requirements: Dict[str, Any]) -> pd.DataFrame:
+    def _apply_filters(self,
+                       candidates: CandidateBatch,
+                       requirements: Dict[str, Any]) -> np.ndarray:
         """
         Apply hard constraint filters to candidate materials.
-        
+
         Args:
-            candidates: DataFrame of candidate materials
+            candidates: Batch of candidate materials
             requirements: User requirements
-            
+
         Returns:
-            Filtered DataFrame
+            Boolean mask of the candidates that pass every filter
         """
-        filtered = candidates.copy()
-        
-        # Density filter
-        if 'max_density' in requirements:
-            filtered = filtered[filtered['density'] <= requirements['max_density']]
-        
-        # Stability filter (only stable or near-stable materials)
-        filtered = filtered[filtered['energy_above_hull'] <= 0.1]
-        
+        # Local constraints accumulate boolean masks that are combined in
+        # a single pass.
+        masks = []
+
+        # Density and stability bounds, fused into one compiled pass.
+        # search_by_properties already applies them server-side, so for
+        # its results this is a cheap no-op guard; it keeps the filter
+        # correct for batches built from other sources.
+        if candidates.density is not None and candidates.energy_above_hull is not None:
+            has_density_limit = 'max_density' in requirements
+            max_density = np.float32(requirements['max_density']) \
+                if has_density_limit else np.float32(np.inf)
+            masks.append(filter_mask(
+                candidates.density, candidates.energy_above_hull,
+                max_density, np.float32(0.1), has_density_limit
+            ))
+
         # TODO: Add more filters as we expand
         # - Temperature stability
         # - Corrosion resistance (need additional data source)
         # - Cost (need cost database)
-        
-        return filtered
+
+        if not masks:
+            return np.ones(len(candidates), dtype=bool)
+
+        return np.logical_and.reduce(masks)
     
     def _score_materials(self,
-                        materials: pd.DataFrame,
+                        materials: CandidateBatch,
                         requirements: Dict[str, Any],
-                        optimize: Optional[List[str]] = None) -> pd.DataFrame:
+                        optimize: Optional[List[str]] = None) -> np.ndarray:
         """
         Score materials based on how well they match requirements.
-        
+
         Args:
             materials: Filtered candidate materials
             requirements: User requirements
             optimize: Optimization objectives
-            
+
         Returns:
-            DataFrame with match_score column, sorted by score
+            Array of match scores, one per material
         """
-        scored = materials.copy()
-        
-        # Initialize score
-        scores = np.zeros(len(scored))
-        
-        # Density score (lower is better for weight optimization)
-        if optimize and 'weight' in optimize:
-            if 'density' in scored.columns:
-                density_normalized = 1 - (scored['density'] - scored['density'].min()) / \
-                                    (scored['density'].max() - scored['density'].min() + 1e-10)
-                scores += density_normalized * 30
-        
+        den = materials.density
+        eah = materials.energy_above_hull
+        bg = materials.band_gap
+
+        # Density score (lower is better for weight optimization).
+        # nan-reductions match the skipna pandas behavior: one null value
+        # must not poison the normalization for every other material
+        density_term = 0.0
+        if optimize and 'weight' in optimize and den is not None:
+            den_min = np.nanmin(den)
+            den_max = np.nanmax(den)
+            density_term = 30.0 * (1.0 - (den - den_min) / (den_max - den_min + 1e-10))
+
         # Stability score (lower energy above hull is better)
-        if 'energy_above_hull' in scored.columns:
-            stability_score = 1 - (scored['energy_above_hull'] / 0.1)
-            stability_score = stability_score.clip(0, 1)
-            scores += stability_score * 40
-        
+        stability_term = 0.0
+        if eah is not None:
+            stability_term = 40.0 * np.clip(1.0 - eah / 0.1, 0, 1)
+
         # Band gap score (closer to requirements is better)
-        if 'min_band_gap' in requirements and 'band_gap' in scored.columns:
+        gap_term = 0.0
+        if 'min_band_gap' in requirements and bg is not None:
             target = requirements.get('min_band_gap', 0)
-            gap_diff = abs(scored['band_gap'] - target)
-            gap_score = 1 - (gap_diff / (scored['band_gap'].max() + 1))
-            gap_score = gap_score.clip(0, 1)
-            scores += gap_score * 30
-        
-        # Add baseline score for materials that passed filters
-        scores += 10
-        
-        scored['match_score'] = scores
-        
-        return scored.sort_values('match_score', ascending=False)
+            bg_max = np.nanmax(bg)
+            # One float32 buffer carried through the whole ufunc chain,
+            # so the term allocates no intermediates
+            out = np.empty_like(bg)
+            np.subtract(bg, np.float32(target), out=out)
+            np.abs(out, out=out)
+            np.divide(out, bg_max + np.float32(1), out=out)
+            np.subtract(np.float32(1), out, out=out)
+            np.clip(out, 0, 1, out=out)
+            gap_term = 30.0 * out
+
+        # Fused accumulation on top of the 10-point baseline for passing
+        # the filters; inactive terms stay scalar zeros and broadcast away
+        scores = 10.0 + density_term + stability_term + gap_term
+        if np.ndim(scores) == 0:
+            scores = np.full(len(materials), scores)
+
+        return scores
     
     def _enrich_materials(self, materials: pd.DataFrame) -> pd.DataFrame:
         """
@@ -195,26 +296,41 @@ class MatSelectAI:
         Returns:
             Enriched DataFrame with explanations
         """
-        enriched = materials.copy()
-        
-        # Add recommendation reasons
-        reasons = []
-        for idx, row in enriched.iterrows():
-            reason_parts = []
-            
-            if row.get('is_stable', False):
-                reason_parts.append("Thermodynamically stable")
-            
-            if row.get('density', 10) < 5.0:
-                reason_parts.append("Lightweight")
-            
-            if row.get('energy_above_hull', 1) < 0.02:
-                reason_parts.append("Highly stable")
-            
-            reasons.append("; ".join(reason_parts) if reason_parts else "Meets requirements")
-        
-        enriched['recommendation_reason'] = reasons
-        
+        enriched = materials
+
+        # The candidate search only fetched scoring fields; pull the
+        # display/explanation extras for just these top-N materials
+        if len(enriched) > 0:
+            extras = self.mp_source.get_materials_by_ids(
+                list(enriched['mp_id']), fields=_ENRICHMENT_FIELDS
+            )
+            if len(extras) > 0:
+                enriched = enriched.merge(extras, on='mp_id', how='left')
+
+        n = len(enriched)
+
+        # Recommendation reasons are kept as boolean mask columns; the
+        # human-readable strings are only synthesized when display or
+        # export actually asks for them
+        if 'is_stable' in enriched.columns:
+            m_stable = enriched['is_stable'].fillna(False).to_numpy(dtype=bool)
+        else:
+            m_stable = np.zeros(n, dtype=bool)
+
+        if 'density' in enriched.columns:
+            m_light = enriched['density'].fillna(10).to_numpy() < 5.0
+        else:
+            m_light = np.zeros(n, dtype=bool)
+
+        if 'energy_above_hull' in enriched.columns:
+            m_highstable = enriched['energy_above_hull'].fillna(1).to_numpy() < 0.02
+        else:
+            m_highstable = np.zeros(n, dtype=bool)
+
+        enriched.loc[:, '_reason_stable'] = m_stable
+        enriched.loc[:, '_reason_light'] = m_light
+        enriched.loc[:, '_reason_highstable'] = m_highstable
+
         return enriched
     
     def explore_tradeoffs(self,
@@ -254,32 +370,41 @@ class MatSelectAI:
             Comparison DataFrame
         """
         materials_to_compare = [baseline_material] + alternative_materials
-        
-        comparison_data = []
+
+        # Fetch all materials in a single batched API call
+        df = self.mp_source.get_materials_by_ids(materials_to_compare)
+
+        found = set(df['mp_id']) if len(df) > 0 else set()
         for mp_id in materials_to_compare:
-            try:
-                mat_data = self.mp_source.get_material_by_id(mp_id)
-                comparison_data.append(mat_data)
-            except ValueError:
+            if mp_id not in found:
                 print(f"Warning: Material {mp_id} not found")
-        
-        df = pd.DataFrame(comparison_data)
-        
+
+        if len(df) > 0:
+            # Restore the requested order (baseline first)
+            order = [mp_id for mp_id in materials_to_compare if mp_id in found]
+            df = df.set_index('mp_id').loc[order].reset_index()
+
         if show_savings and len(df) > 1:
             # Calculate percentage differences from baseline
-            baseline = df.iloc[0]
             for col in ['density', 'band_gap', 'formation_energy']:
                 if col in df.columns:
                     df[f'{col}_vs_baseline_%'] = \
-                        ((df[col] - baseline[col]) / baseline[col] * 100).round(1)
-        
+                        ((df[col] - df[col].iloc[0]) / df[col].iloc[0] * 100).round(1)
+
         return df
 
 
 class RecommendationResults:
     """Container for recommendation results with display methods."""
-    
-    def __init__(self, 
+
+    # Reason mask columns set by _enrich_materials and their labels
+    _REASON_LABELS = (
+        ('_reason_stable', 'Thermodynamically stable'),
+        ('_reason_light', 'Lightweight'),
+        ('_reason_highstable', 'Highly stable'),
+    )
+
+    def __init__(self,
                  candidates: pd.DataFrame,
                  requirements: Dict[str, Any],
                  optimize_objectives: Optional[List[str]] = None,
@@ -288,7 +413,29 @@ class RecommendationResults:
         self.requirements = requirements
         self.optimize_objectives = optimize_objectives
         self.show_tradeoffs = show_tradeoffs
-    
+        self._reason_cache: Optional[pd.Series] = None
+
+    @property
+    def recommendation_reason(self) -> pd.Series:
+        """Human-readable reason strings, synthesized on first access."""
+        if self._reason_cache is None:
+            label_cols = [
+                np.where(self.candidates[column].to_numpy(dtype=bool), label, "")
+                for column, label in self._REASON_LABELS
+                if column in self.candidates.columns
+            ]
+            if label_cols:
+                reasons = [
+                    "; ".join(filter(None, parts)) or "Meets requirements"
+                    for parts in zip(*label_cols)
+                ]
+            else:
+                reasons = ["Meets requirements"] * len(self.candidates)
+            self._reason_cache = pd.Series(
+                reasons, index=self.candidates.index, name='recommendation_reason'
+            )
+        return self._reason_cache
+
     def display(self):
         """Display recommendations in a formatted way."""
         if len(self.candidates) == 0:
@@ -302,17 +449,40 @@ class RecommendationResults:
         print(f"  TOP {len(self.candidates)} MATERIAL RECOMMENDATIONS")
         print("="*80 + "\n")
         
-        for idx, (_, row) in enumerate(self.candidates.iterrows(), 1):
-            print(f"#{idx} - {row['formula']} ({row['mp_id']})")
-            print(f"   ✓ Match Score: {row.get('match_score', 0):.1f}%")
-            print(f"   ✓ Density: {row.get('density', 0):.2f} g/cm³")
-            print(f"   ✓ Band Gap: {row.get('band_gap', 0):.2f} eV")
-            print(f"   ✓ Stability: {row.get('energy_above_hull', 0):.3f} eV/atom above hull")
-            print(f"   ✓ Crystal System: {row.get('crystal_system', 'Unknown')}")
-            
-            if 'recommendation_reason' in row:
-                print(f"\n   Why Recommended: {row['recommendation_reason']}")
-            
+        # Plain-tuple iteration; reindex fills any missing columns with
+        # NaN so the unpack below never depends on pipeline internals
+        has_reasons = '_reason_stable' in self.candidates.columns
+        rows = self.candidates.reindex(columns=[
+            'formula', 'mp_id', 'match_score', 'density', 'band_gap',
+            'energy_above_hull', 'crystal_system',
+            '_reason_stable', '_reason_light', '_reason_highstable'
+        ]).fillna({
+            'match_score': 0, 'density': 0, 'band_gap': 0, 'energy_above_hull': 0,
+            '_reason_stable': False, '_reason_light': False, '_reason_highstable': False
+        })
+
+        for rank, tup in enumerate(rows.itertuples(index=False, name=None), 1):
+            formula, mp_id, score, density, band_gap, eah, crystal, \
+                stable, light, highstable = tup
+
+            print(f"#{rank} - {formula} ({mp_id})")
+            print(f"   ✓ Match Score: {score:.1f}%")
+            print(f"   ✓ Density: {density:.2f} g/cm³")
+            print(f"   ✓ Band Gap: {band_gap:.2f} eV")
+            print(f"   ✓ Stability: {eah:.3f} eV/atom above hull")
+            print(f"   ✓ Crystal System: {crystal if isinstance(crystal, str) else 'Unknown'}")
+
+            if has_reasons:
+                reason_parts = []
+                if stable:
+                    reason_parts.append("Thermodynamically stable")
+                if light:
+                    reason_parts.append("Lightweight")
+                if highstable:
+                    reason_parts.append("Highly stable")
+                reason = "; ".join(reason_parts) if reason_parts else "Meets requirements"
+                print(f"\n   Why Recommended: {reason}")
+
             print("\n" + "-"*80 + "\n")
     
     def to_dataframe(self) -> pd.DataFrame:
@@ -321,20 +491,52 @@ class RecommendationResults:
     
     def export_to_csv(self, filename: str):
         """Export results to CSV file."""
-        self.candidates.to_csv(filename, index=False)
+        export = self.candidates.drop(
+            columns=[column for column, _ in self._REASON_LABELS],
+            errors='ignore'
+        )
+        export['recommendation_reason'] = self.recommendation_reason
+        export.to_csv(filename, index=False)
         print(f"✓ Results exported to {filename}")
 
 
 class TradeOffAnalysis:
     """Container for trade-off analysis results."""
-    
+
+    # Maps optimization objectives to the data column they minimize
+    _OBJECTIVE_COLUMNS = {
+        'weight': 'density',
+        'stability': 'energy_above_hull',
+    }
+
     def __init__(self, materials: pd.DataFrame, objectives: List[str]):
         self.materials = materials
         self.objectives = objectives
-    
+
+    def pareto_frontier(self) -> pd.DataFrame:
+        """
+        Return the materials on the Pareto frontier of the objectives.
+
+        A material is on the frontier if no other material is at least
+        as good on every objective and strictly better on one.
+        """
+        columns = [
+            self._OBJECTIVE_COLUMNS.get(objective, objective)
+            for objective in self.objectives
+        ]
+        columns = [c for c in columns if c in self.materials.columns]
+
+        if not columns or len(self.materials) == 0:
+            return self.materials
+
+        objs = self.materials[columns].to_numpy(dtype=np.float32)
+        return self.materials.loc[np.asarray(pareto_mask(objs))]
+
     def plot_pareto_frontier(self):
         """Plot Pareto frontier of trade-offs."""
+        frontier = self.pareto_frontier()
+
         # TODO: Implement Pareto frontier visualization
         print("📊 Pareto frontier plotting coming soon!")
         print(f"Objectives: {', '.join(self.objectives)}")
-        print(f"Materials on frontier: {len(self.materials)}")
+        print(f"Materials on frontier: {len(frontier)} of {len(self.materials)}")
@@ -4,12 +4,147 @@ Materials Project API Integration
 This module handles all interactions with the Materials Project database.
 """
 
+import hashlib
 import os
-from typing import List, Dict, Optional, Any
+import re
+import time
+from collections import OrderedDict
+from typing import List, Dict, Optional, Any, Tuple
+import numpy as np
 import pandas as pd
 from mp_api.client import MPRester
 
 
+# Minimal field set needed by the recommendation pipeline's filtering
+# and scoring steps. Every extra field is bytes over the wire and an
+# object allocation per document, so searches default to this.
+_SEARCH_FIELDS_MINIMAL = [
+    'material_id', 'formula_pretty', 'energy_above_hull',
+    'band_gap', 'density'
+]
+
+# Full field set for detailed single/batch material lookups
+_DETAIL_FIELDS = [
+    'material_id', 'formula_pretty', 'composition',
+    'energy_above_hull', 'band_gap', 'density',
+    'formation_energy_per_atom', 'symmetry',
+    'theoretical', 'is_stable', 'volume', 'elastic'
+]
+
+# Maps each API field to the DataFrame column(s) it produces and how to
+# extract them from a summary doc
+_FIELD_COLUMNS = {
+    'material_id': (
+        ('mp_id', lambda doc: str(doc.material_id)),
+    ),
+    'formula_pretty': (
+        ('formula', lambda doc: doc.formula_pretty),
+    ),
+    'composition': (
+        ('composition', lambda doc: str(doc.composition)),
+    ),
+    'energy_above_hull': (
+        ('energy_above_hull', lambda doc: doc.energy_above_hull),
+    ),
+    'band_gap': (
+        ('band_gap', lambda doc: doc.band_gap),
+    ),
+    'density': (
+        ('density', lambda doc: doc.density),
+    ),
+    'formation_energy_per_atom': (
+        ('formation_energy', lambda doc: doc.formation_energy_per_atom),
+    ),
+    'volume': (
+        ('volume', lambda doc: doc.volume),
+    ),
+    'symmetry': (
+        ('crystal_system', lambda doc: doc.symmetry.crystal_system.value if doc.symmetry else None),
+        ('space_group', lambda doc: doc.symmetry.symbol if doc.symmetry else None),
+    ),
+    'is_stable': (
+        ('is_stable', lambda doc: doc.is_stable),
+    ),
+    'theoretical': (
+        ('is_theoretical', lambda doc: doc.theoretical),
+    ),
+    'elastic': (
+        ('bulk_modulus', lambda doc: doc.elastic.k_vrh if doc.elastic else None),
+        ('shear_modulus', lambda doc: doc.elastic.g_vrh if doc.elastic else None),
+        ('youngs_modulus', lambda doc: doc.elastic.universal_anisotropy if doc.elastic else None),
+    ),
+}
+
+
+# Crystal systems take at most seven values, so the column is stored as
+# a categorical. A single explicit dtype keeps category codes identical
+# across every result frame, making concatenation cheap.
+_CRYSTAL_SYSTEM_DTYPE = pd.CategoricalDtype([
+    'Triclinic', 'Monoclinic', 'Orthorhombic', 'Tetragonal',
+    'Trigonal', 'Hexagonal', 'Cubic'
+])
+
+# Numeric columns are materialized as contiguous float32 arrays: half
+# the memory of the float64 default and SIMD-friendly for scoring math
+_FLOAT32_COLUMNS = frozenset([
+    'energy_above_hull', 'band_gap', 'density', 'formation_energy',
+    'volume', 'bulk_modulus', 'shear_modulus', 'youngs_modulus'
+])
+
+
+# Max number of query results kept in the in-memory LRU cache
+_QUERY_CACHE_SIZE = 128
+
+# Paging for large searches: results are fetched in up to _SEARCH_WORKERS
+# concurrent page requests, but never in pages smaller than _MIN_CHUNK_SIZE
+# (tiny pages cost more in per-request overhead than they save)
+_SEARCH_WORKERS = 4
+_MIN_CHUNK_SIZE = 100
+
+# How long a check_api_status result stays valid
+_API_STATUS_TTL = 300.0  # seconds
+
+
+def _query_key(kind: str, **params) -> Tuple:
+    """Build a canonical, hashable signature for a query."""
+    items = []
+    for name in sorted(params):
+        value = params[name]
+        if isinstance(value, (list, tuple)):
+            value = tuple(value)
+        items.append((name, value))
+    return (kind,) + tuple(items)
+
+
+def _docs_to_dataframe(docs, fields: List[str],
+                       limit: Optional[int] = None) -> pd.DataFrame:
+    """Convert summary docs to a DataFrame with just the requested fields.
+
+    Builds the frame column-by-column rather than from a list of per-row
+    dicts, so pandas never has to infer dtypes row-wise.
+    """
+    extractors = [pair for field in fields for pair in _FIELD_COLUMNS.get(field, ())]
+
+    if limit is not None:
+        docs = docs[:limit]
+
+    columns = {column: [] for column, _ in extractors}
+    for doc in docs:
+        for column, extract in extractors:
+            columns[column].append(extract(doc))
+
+    for column, values in columns.items():
+        if column in _FLOAT32_COLUMNS:
+            columns[column] = np.asarray(
+                [np.nan if value is None else value for value in values],
+                dtype=np.float32
+            )
+        elif column == 'crystal_system':
+            columns[column] = pd.Categorical(values, dtype=_CRYSTAL_SYSTEM_DTYPE)
+
+    return pd.DataFrame(columns)
+
+
 class MaterialsProjectSource:
     """
     Interface to the Materials Project database via their API.
@@ -18,13 +153,17 @@ class MaterialsProjectSource:
     from the Materials Project's 150,000+ material database.
     """
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None,
+                 cache_dir: Optional[str] = None):
         """
         Initialize the Materials Project client.
-        
+
         Args:
-            api_key: Materials Project API key. If None, reads from 
+            api_key: Materials Project API key. If None, reads from
                     MP_API_KEY environment variable.
+            cache_dir: Directory for persisting query results across
+                    processes (e.g. '~/.matselect_cache'). If None,
+                    results are only cached in memory.
         """
         self.api_key = api_key or os.getenv('MP_API_KEY')
         if not self.api_key:
@@ -33,7 +172,58 @@ class MaterialsProjectSource:
                 "or set MP_API_KEY environment variable. Get your key at: "
                 "https://materialsproject.org/dashboard"
             )
-    
+
+        # One long-lived client so the underlying HTTPS session (and its
+        # connection pool) is reused across calls instead of being
+        # re-established per request
+        self._mpr = MPRester(self.api_key)
+
+        # MP results are immutable between database releases, so repeat
+        # queries are served from a small LRU cache of parsed DataFrames
+        self._query_cache: 'OrderedDict[Tuple, pd.DataFrame]' = OrderedDict()
+        self._cache_dir = os.path.expanduser(cache_dir) if cache_dir else None
+        if self._cache_dir:
+            os.makedirs(self._cache_dir, exist_ok=True)
+
+    def _cache_get(self, key: Tuple) -> Optional[pd.DataFrame]:
+        """Look up a query result, checking memory first, then disk."""
+        if key in self._query_cache:
+            self._query_cache.move_to_end(key)
+            return self._query_cache[key].copy()
+
+        if self._cache_dir:
+            path = os.path.join(self._cache_dir, self._cache_filename(key))
+            if os.path.exists(path):
+                df = pd.read_pickle(path)
+                self._cache_put(key, df, persist=False)
+                return df.copy()
+
+        return None
+
+    def _cache_put(self, key: Tuple, df: pd.DataFrame, persist: bool = True):
+        """Store a query result, evicting the least recently used entry."""
+        self._query_cache[key] = df
+        self._query_cache.move_to_end(key)
+        while len(self._query_cache) > _QUERY_CACHE_SIZE:
+            self._query_cache.popitem(last=False)
+
+        if persist and self._cache_dir:
+            df.to_pickle(os.path.join(self._cache_dir, self._cache_filename(key)))
+
+    @staticmethod
+    def _cache_filename(key: Tuple) -> str:
+        return hashlib.blake2b(repr(key).encode()).hexdigest()[:32] + '.pkl'
+
+    def close(self):
+        """Close the underlying API client and its HTTP session."""
+        self._mpr.__exit__(None, None, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
     def search_by_properties(self,
                             elements: Optional[List[str]] = None,
                             min_band_gap: Optional[float] = None,
@@ -41,10 +231,12 @@ class MaterialsProjectSource:
                             min_energy_above_hull: Optional[float] = None,
                             max_energy_above_hull: Optional[float] = 0.05,
                             crystal_systems: Optional[List[str]] = None,
-                            limit: int = 100) -> pd.DataFrame:
+                            max_density: Optional[float] = None,
+                            limit: int = 100,
+                            fields: Optional[List[str]] = None) -> pd.DataFrame:
         """
         Search for materials by property constraints.
-        
+
         Args:
             elements: List of elements to include (e.g., ['Fe', 'O'])
             min_band_gap: Minimum band gap in eV
@@ -52,109 +244,115 @@ class MaterialsProjectSource:
             min_energy_above_hull: Min energy above hull (stability metric)
             max_energy_above_hull: Max energy above hull (default 0.05 eV/atom)
             crystal_systems: Filter by crystal system
+            max_density: Maximum density in g/cm³ (filtered server-side)
             limit: Maximum number of results
-            
+            fields: API fields to request. Defaults to the minimal set
+                    needed for filtering and scoring.
+
         Returns:
             DataFrame with material properties
         """
-        with MPRester(self.api_key) as mpr:
-            # Build search criteria
-            # Always filter for stable or near-stable materials
-            if max_energy_above_hull is None:
-                max_energy_above_hull = 0.1  # Default: only stable/near-stable materials
-            
-            # Search with proper parameter format
-            search_params = {
-                'energy_above_hull': (0, max_energy_above_hull),
-            }
-            
-            if elements:
-                search_params['elements'] = elements
-            
-            if min_band_gap is not None or max_band_gap is not None:
-                bg_min = min_band_gap if min_band_gap is not None else 0
-                bg_max = max_band_gap if max_band_gap is not None else 15
-                search_params['band_gap'] = (bg_min, bg_max)
-            
-            # Search
-            docs = mpr.materials.summary.search(
-                **search_params,
-                fields=[
-                    'material_id', 'formula_pretty', 'composition',
-                    'energy_above_hull', 'band_gap', 'density',
-                    'formation_energy_per_atom', 'symmetry',
-                    'theoretical', 'is_stable'
-                ]
+        # Build search criteria
+        # Always filter for stable or near-stable materials
+        if max_energy_above_hull is None:
+            max_energy_above_hull = 0.1  # Default: only stable/near-stable materials
+
+        # Search with proper parameter format
+        search_params = {
+            'energy_above_hull': (0, max_energy_above_hull),
+        }
+
+        if elements:
+            search_params['elements'] = elements
+
+        if min_band_gap is not None or max_band_gap is not None:
+            bg_min = min_band_gap if min_band_gap is not None else 0
+            bg_max = max_band_gap if max_band_gap is not None else 15
+            search_params['band_gap'] = (bg_min, bg_max)
+
+        if max_density is not None:
+            search_params['density'] = (0, max_density)
+
+        if fields is None:
+            fields = _SEARCH_FIELDS_MINIMAL
+
+        key = _query_key('search', limit=limit, fields=fields, **search_params)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        # Cap the download at `limit` docs and split it across parallel
+        # page fetches; MPRester runs the chunks concurrently
+        num_chunks = min(_SEARCH_WORKERS, max(1, limit // _MIN_CHUNK_SIZE))
+        chunk_size = -(-limit // num_chunks)  # ceil division
+
+        try:
+            docs = self._mpr.materials.summary.search(
+                **search_params, fields=fields,
+                chunk_size=chunk_size, num_chunks=num_chunks
             )
-            
-            # Convert to DataFrame
-            data = []
-            for doc in docs[:limit]:
-                data.append({
-                    'mp_id': str(doc.material_id),
-                    'formula': doc.formula_pretty,
-                    'composition': str(doc.composition),
-                    'energy_above_hull': doc.energy_above_hull,
-                    'band_gap': doc.band_gap,
-                    'density': doc.density,
-                    'formation_energy': doc.formation_energy_per_atom,
-                    'crystal_system': doc.symmetry.crystal_system.value if doc.symmetry else None,
-                    'is_stable': doc.is_stable,
-                    'is_theoretical': doc.theoretical
-                })
-            
-            return pd.DataFrame(data)
+        except TypeError:
+            # Older mp_api clients without chunking support
+            docs = self._mpr.materials.summary.search(**search_params, fields=fields)
+
+        df = _docs_to_dataframe(docs, fields, limit=limit)
+        self._cache_put(key, df)
+        return df.copy()
     
+    def get_materials_by_ids(self,
+                             material_ids: List[str],
+                             fields: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Get detailed information for a batch of materials in one API call.
+
+        Args:
+            material_ids: List of Materials Project IDs (e.g., ['mp-149', 'mp-66'])
+            fields: API fields to request. Defaults to the full detail set.
+
+        Returns:
+            DataFrame with comprehensive material data, one row per
+            material that was found
+        """
+        if fields is None:
+            fields = _DETAIL_FIELDS
+
+        key = _query_key('by_ids', material_ids=material_ids, fields=fields)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        docs = self._mpr.materials.summary.search(
+            material_ids=material_ids,
+            fields=fields
+        )
+
+        df = _docs_to_dataframe(docs, fields)
+        self._cache_put(key, df)
+        return df.copy()
+
     def get_material_by_id(self, material_id: str) -> Dict[str, Any]:
         """
         Get detailed information for a specific material.
-        
+
         Args:
             material_id: Materials Project ID (e.g., 'mp-149')
-            
+
         Returns:
             Dictionary with comprehensive material data
         """
-        with MPRester(self.api_key) as mpr:
-            docs = mpr.materials.summary.search(
-                material_ids=[material_id],
-                fields=[
-                    'material_id', 'formula_pretty', 'composition',
-                    'energy_above_hull', 'band_gap', 'density',
-                    'formation_energy_per_atom', 'symmetry',
-                    'theoretical', 'is_stable', 'volume',
-                    'elastic', 'piezoelectric', 'dielectric'
-                ]
-            )
-            
-            if not docs:
-                raise ValueError(f"Material {material_id} not found")
-            
-            doc = docs[0]
-            
-            # Build comprehensive response
-            result = {
-                'mp_id': str(doc.material_id),
-                'formula': doc.formula_pretty,
-                'composition': str(doc.composition),
-                'energy_above_hull': doc.energy_above_hull,
-                'band_gap': doc.band_gap,
-                'density': doc.density,
-                'formation_energy': doc.formation_energy_per_atom,
-                'volume': doc.volume,
-                'crystal_system': doc.symmetry.crystal_system.value if doc.symmetry else None,
-                'space_group': doc.symmetry.symbol if doc.symmetry else None,
-                'is_stable': doc.is_stable,
-                'is_theoretical': doc.theoretical
-            }
-            
-            # Add elastic properties if available
-            if doc.elastic:
-                result['bulk_modulus'] = doc.elastic.k_vrh
-                result['shear_modulus'] = doc.elastic.g_vrh
-                result['youngs_modulus'] = doc.elastic.universal_anisotropy
-            
-            return result
+        df = self.get_materials_by_ids([material_id])
+
+        if len(df) == 0:
+            raise ValueError(f"Material {material_id} not found")
+
+        result = df.iloc[0].to_dict()
+
+        # Drop elastic properties that weren't available for this material
+        for key in ('bulk_modulus', 'shear_modulus', 'youngs_modulus'):
+            if key in result and pd.isna(result[key]):
+                del result[key]
+
+        return result
     
     def search_by_formula(self, formula: str) -> pd.DataFrame:
         """
@@ -166,27 +364,21 @@ class MaterialsProjectSource:
         Returns:
             DataFrame with matching materials
         """
-        with MPRester(self.api_key) as mpr:
-            docs = mpr.materials.summary.search(
-                formula=formula,
-                fields=[
-                    'material_id', 'formula_pretty', 'energy_above_hull',
-                    'band_gap', 'density', 'is_stable'
-                ]
-            )
-            
-            data = []
-            for doc in docs:
-                data.append({
-                    'mp_id': str(doc.material_id),
-                    'formula': doc.formula_pretty,
-                    'energy_above_hull': doc.energy_above_hull,
-                    'band_gap': doc.band_gap,
-                    'density': doc.density,
-                    'is_stable': doc.is_stable
-                })
-            
-            return pd.DataFrame(data)
+        fields = [
+            'material_id', 'formula_pretty', 'energy_above_hull',
+            'band_gap', 'density', 'is_stable'
+        ]
+
+        key = _query_key('formula', formula=formula, fields=fields)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        docs = self._mpr.materials.summary.search(formula=formula, fields=fields)
+
+        df = _docs_to_dataframe(docs, fields)
+        self._cache_put(key, df)
+        return df.copy()
     
     def get_similar_materials(self, 
                              material_id: str,
@@ -238,35 +430,55 @@ class MaterialsProjectSource:
         
         return ranges.get(property_name, (None, None))
     
+    # Status checks shared by every instance in the process, keyed by a
+    # hash of the API key (never the key itself)
+    _api_status_cache: Dict[str, Tuple[bool, float]] = {}
+
     def check_api_status(self) -> bool:
         """
         Check if the API key is valid and API is accessible.
-        
+
+        The result is cached per API key for a few minutes, so creating
+        several MatSelectAI instances in one process only pays for a
+        single round-trip.
+
         Returns:
             True if API is accessible, False otherwise
         """
+        key_hash = hashlib.blake2b(self.api_key.encode()).hexdigest()[:16]
+
+        cached = self._api_status_cache.get(key_hash)
+        if cached is not None:
+            status, checked_at = cached
+            if time.monotonic() - checked_at < _API_STATUS_TTL:
+                return status
+
         try:
-            with MPRester(self.api_key) as mpr:
-                # Try a simple query
-                docs = mpr.materials.summary.search(
-                    material_ids=['mp-149'],
-                    fields=['material_id']
-                )
-                return len(docs) > 0
+            # Try a simple query
+            docs = self._mpr.materials.summary.search(
+                material_ids=['mp-149'],
+                fields=['material_id']
+            )
+            status = len(docs) > 0
         except Exception as e:
             print(f"API check failed: {e}")
-            return False
+            status = False
+
+        self._api_status_cache[key_hash] = (status, time.monotonic())
+        return status
 
 
 # Utility functions
 
+_ELEMENT_RE = re.compile(r'[A-Z][a-z]?')
+_SUBSCRIPT_TABLE = str.maketrans('0123456789', '₀₁₂₃₄₅₆₇₈₉')
+
+
 def format_formula(formula: str) -> str:
     """Format chemical formula with subscripts for display."""
-    import re
-    return re.sub(r'(\d+)', r'₀₁₂₃₄₅₆₇₈₉'[int(r'\1')], formula)
+    return formula.translate(_SUBSCRIPT_TABLE)
 
 
 def get_element_list(formula: str) -> List[str]:
     """Extract list of elements from chemical formula."""
-    import re
-    return re.findall(r'[A-Z][a-z]?', formula)
+    return _ELEMENT_RE.findall(formula)